@@ -1,21 +1,25 @@
-from fastapi import FastAPI, HTTPException, Depends, Response
-from models.request import InsertRequest
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from models.request import InsertRequest, TABLE_MODELS
 from models.response import InsertResponse
+from cachetools import TTLCache
+from pydantic import ValidationError
+import asyncio
 import asyncpg
+import hashlib
+import pygal
 import traceback
-from datetime import datetime
 from dotenv import load_dotenv
 import logging
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
 
 env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
 load_dotenv(env_path)
 
-app = FastAPI()
+# orjson serializes the metric row lists (datetimes included) in C,
+# much faster than the default json-based encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
@@ -27,14 +31,33 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-async def get_db():
-    conn = await asyncpg.connect(
-        host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD
+@app.on_event("startup")
+async def startup():
+    # Shared pool: connections (and their statement/codec caches) are
+    # reused across requests instead of paying TCP + auth setup per
+    # request; idle connections are kept warm for 5 minutes. The large
+    # statement cache keeps every metrics statement prepared for the
+    # connection's lifetime after its first execution
+    app.state.pool = await asyncpg.create_pool(
+        host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+        min_size=4, max_size=20, max_inactive_connection_lifetime=300,
+        statement_cache_size=1024
     )
-    try:
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.pool.close()
+
+
+async def get_db():
+    async with app.state.pool.acquire() as conn:
         yield conn
-    finally:
-        await conn.close()
+
+# At most this many failed records are echoed back in the response;
+# beyond it only a count is returned, keeping memory and response size
+# bounded for very large (or abusive) payloads
+MAX_FAILED_REPORTED = 1000
 
 TABLE_SCHEMAS = {
     "departments": ["department"],
@@ -42,6 +65,130 @@ TABLE_SCHEMAS = {
     "hired_employees": ["name", "hire_datetime", "department_id", "job_id"],
 }
 
+# PostgreSQL array types per column, used to build the bulk unnest INSERT
+TABLE_COLUMN_TYPES = {
+    "departments": ["text"],
+    "jobs": ["text"],
+    "hired_employees": ["text", "timestamptz", "int", "int"],
+}
+
+# Metrics queries live at module level so every call reuses the exact
+# same statement text and hits asyncpg's per-connection statement cache
+QUARTER_SQL = """
+SELECT
+    d.department AS department,
+    j.job AS job,
+    COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 1 THEN 1 END) AS Q1,
+    COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 2 THEN 1 END) AS Q2,
+    COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 3 THEN 1 END) AS Q3,
+    COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 4 THEN 1 END) AS Q4
+FROM hired_employees he
+JOIN departments d ON he.department_id = d.id
+JOIN jobs j ON he.job_id = j.id
+WHERE he.hire_datetime >= '2021-01-01' AND he.hire_datetime < '2022-01-01'
+GROUP BY d.department, j.job
+ORDER BY d.department ASC, j.job ASC;
+"""
+
+# Long-form variant for the quarter chart: the unpivot happens in SQL so
+# the rows feed the pygal renderer directly, with no DataFrame melt in
+# between
+QUARTER_LONG_SQL = """
+SELECT
+    d.department AS department,
+    j.job AS job,
+    EXTRACT(QUARTER FROM he.hire_datetime)::int AS quarter,
+    COUNT(*) AS hires
+FROM hired_employees he
+JOIN departments d ON he.department_id = d.id
+JOIN jobs j ON he.job_id = j.id
+WHERE he.hire_datetime >= '2021-01-01' AND he.hire_datetime < '2022-01-01'
+GROUP BY d.department, j.job, quarter
+ORDER BY d.department ASC, quarter ASC;
+"""
+
+DEPT_AVG_SQL = """
+WITH department_hiring AS (
+    SELECT
+        he.department_id AS id,
+        d.department,
+        COUNT(he.id) AS hired
+    FROM hired_employees he
+    JOIN departments d ON he.department_id = d.id
+    WHERE he.hire_datetime >= '2021-01-01' AND he.hire_datetime < '2022-01-01'
+    GROUP BY he.department_id, d.department
+),
+average_hiring AS (
+    SELECT AVG(hired) AS avg_hires FROM department_hiring
+)
+SELECT
+    dh.id,
+    dh.department,
+    dh.hired,
+    ah.avg_hires
+FROM department_hiring dh
+JOIN average_hiring ah ON dh.hired > ah.avg_hires
+ORDER BY dh.hired DESC;
+"""
+
+
+# Small in-process cache: the 2021 data changes rarely, so metric JSON
+# and rendered chart bytes are reused instead of re-querying/re-rendering
+_cache = TTLCache(maxsize=8, ttl=300)
+_cache_lock = asyncio.Lock()
+
+
+async def _cache_get(key):
+    async with _cache_lock:
+        return _cache.get(key)
+
+
+async def _cache_set(key, value):
+    async with _cache_lock:
+        _cache[key] = value
+
+
+async def _cache_clear():
+    async with _cache_lock:
+        _cache.clear()
+
+
+def _stream_metrics(sql, cache_key):
+    """Streams query rows as a JSON array without materializing the full
+    result set, caching the payload once the cursor is exhausted."""
+    async def generate():
+        # The body generator runs after the handler's get_db dependency
+        # has released its connection, so it acquires its own here
+        async with app.state.pool.acquire() as conn:
+            # prepare() hits the per-connection statement cache after
+            # the first call, so this is a dict lookup on warm
+            # connections
+            stmt = await conn.prepare(sql)
+            parts = [b"["]
+            yield b"["
+            first = True
+            async with conn.transaction():  # cursors require a transaction
+                async for row in stmt.cursor(prefetch=1000):
+                    chunk = (b"" if first else b",") + \
+                        orjson.dumps(dict(row), default=float)
+                    first = False
+                    parts.append(chunk)
+                    yield chunk
+        parts.append(b"]")
+        yield b"]"
+        await _cache_set(cache_key, b"".join(parts))
+
+    return StreamingResponse(generate(), media_type="application/json")
+
+
+def _etag_response(content, request, media_type):
+    """Builds a cacheable response, answering 304 on a matching ETag."""
+    etag = hashlib.md5(content).hexdigest()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    return Response(content=content, media_type=media_type,
+                    headers={"ETag": etag, "Cache-Control": "max-age=300"})
+
 
 @app.get("/")
 async def home():
@@ -62,51 +209,74 @@ async def home():
 @app.post("/insert", response_model=InsertResponse)
 async def insert_data(request: InsertRequest, db=Depends(get_db)):
     try:
-        if request.table not in TABLE_SCHEMAS:
-            raise HTTPException(status_code=400, detail="Invalid table name")
-
         required_fields = TABLE_SCHEMAS[request.table]
+        record_model = TABLE_MODELS[request.table]
         valid_records = []
         failed_records = []
+        failed_truncated = 0
+
+        def record_failure(record):
+            nonlocal failed_truncated
+            if len(failed_records) < MAX_FAILED_REPORTED:
+                failed_records.append(record)
+            else:
+                failed_truncated += 1
+
+        # Per-record validation (required fields, types, the ISO-8601
+        # hire_datetime parse) runs in pydantic-core; invalid records are
+        # reported back instead of failing the whole request
+        parsed_records = []
+        for record in request.data:
+            try:
+                parsed_records.append(
+                    (record, record_model.model_validate(record)))
+            except ValidationError:
+                record_failure(record)
+
+        if request.table == "hired_employees":
+            # Fetch all referenced `department_id`/`job_id` values in one
+            # query per parent table instead of two round-trips per record
+            dep_ids = {parsed.department_id for _, parsed in parsed_records}
+            job_ids = {parsed.job_id for _, parsed in parsed_records}
+            valid_deps = {row["id"] for row in await db.fetch(
+                "SELECT id FROM departments WHERE id = ANY($1::int[])", list(dep_ids))}
+            valid_jobs = {row["id"] for row in await db.fetch(
+                "SELECT id FROM jobs WHERE id = ANY($1::int[])", list(job_ids))}
+
+            for record, parsed in parsed_records:
+                if parsed.department_id not in valid_deps or parsed.job_id not in valid_jobs:
+                    record_failure(record)
+                else:
+                    valid_records.append(parsed)
+        else:
+            valid_records = [parsed for _, parsed in parsed_records]
 
         async with db.transaction():  # One transaction for all inserts
-            for record in request.data:
-                if not all(field in record for field in required_fields):
-                    failed_records.append(record)
-                    continue
-
-                # Validate `department_id` and `job_id` for `hired_employees`
-                if request.table == "hired_employees":
-                    try:
-                        record["hire_datetime"] = datetime.fromisoformat(
-                            record["hire_datetime"].replace("Z", "+00:00"))
-                    except ValueError:
-                        failed_records.append(record)
-                        continue
-
-                    dep_exists = await db.fetchval("SELECT COUNT(*) FROM departments WHERE id = $1", record["department_id"])
-                    job_exists = await db.fetchval("SELECT COUNT(*) FROM jobs WHERE id = $1", record["job_id"])
+            if valid_records:
+                # Single bulk INSERT: one round-trip for the whole batch
+                # instead of one per record
+                columns = ", ".join(required_fields)
+                unnest_args = ", ".join(
+                    f"${i+1}::{col_type}[]"
+                    for i, col_type in enumerate(TABLE_COLUMN_TYPES[request.table]))
+                sql_query = f"INSERT INTO {request.table} ({columns}) SELECT * FROM unnest({unnest_args}) RETURNING id"
 
-                    if dep_exists == 0 or job_exists == 0:
-                        failed_records.append(record)
-                        continue
+                records = [tuple(getattr(record, field) for field in required_fields)
+                           for record in valid_records]
+                inserted_rows = await db.fetch(sql_query, *map(list, zip(*records)))
 
-                valid_records.append(record)
+                logger.info(
+                    f"Inserted {len(inserted_rows)} records into {request.table}")
 
-            if valid_records:
-                for record in valid_records:
-                    columns = ", ".join(required_fields)
-                    values_placeholders = ", ".join(
-                        f"${i+1}" for i in range(len(required_fields)))
-                    sql_query = f"INSERT INTO {request.table} ({columns}) VALUES ({values_placeholders}) RETURNING id"
-                    inserted_id = await db.fetchval(sql_query, *tuple(record[field] for field in required_fields))
-
-                    logger.info(f"Inserted record with ID: {inserted_id}")
+        # New hires change every metric and chart; drop the cached copies
+        if valid_records and request.table == "hired_employees":
+            await _cache_clear()
 
         return {
-            "success": True if valid_records else False,
+            "success": bool(valid_records),
             "message": f"{len(valid_records)} records inserted into {request.table}",
-            "failed_records": failed_records
+            "failed_records": failed_records,
+            "failed_truncated": failed_truncated
         }
 
     except Exception as e:
@@ -116,117 +286,82 @@ async def insert_data(request: InsertRequest, db=Depends(get_db)):
 
 
 @app.get("/metrics/hired-employees-by-quarter")
-async def get_hired_employees_by_quarter(db: asyncpg.Connection = Depends(get_db)):
+async def get_hired_employees_by_quarter():
     """Returns the number of employees hired per job and department in 2021,
       grouped by quarter."""
 
-    query = """
-    SELECT
-        d.department AS department,
-        j.job AS job,
-        COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 1 THEN 1 END) AS Q1,
-        COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 2 THEN 1 END) AS Q2,
-        COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 3 THEN 1 END) AS Q3,
-        COUNT(CASE WHEN EXTRACT(QUARTER FROM he.hire_datetime) = 4 THEN 1 END) AS Q4
-    FROM hired_employees he
-    JOIN departments d ON he.department_id = d.id
-    JOIN jobs j ON he.job_id = j.id
-    WHERE EXTRACT(YEAR FROM he.hire_datetime) = 2021
-    GROUP BY d.department, j.job
-    ORDER BY d.department ASC, j.job ASC;
-    """
-
     try:
+        cached = await _cache_get("metrics:quarter")
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
         logger.info("Executing query to fetch hired employees by quarter")
-        results = await db.fetch(query)
-        logger.info(
-            f"Query executed successfully, retrieved {len(results)} records")
-        return [dict(row) for row in results]
+        return _stream_metrics(QUARTER_SQL, "metrics:quarter")
     except Exception as e:
         logger.error(f"Error executing query: {e}")
         return {"error": "Internal Server Error"}
 
 
 @app.get("/metrics/departments-above-average-hiring")
-async def get_departments_above_average(db: asyncpg.Connection = Depends(get_db)):
+async def get_departments_above_average():
     """Returns departments that hired more employees than the 2021 average."""
 
-    query = """
-    WITH department_hiring AS (
-        SELECT
-            he.department_id AS id,
-            d.department,
-            COUNT(he.id) AS hired
-        FROM hired_employees he
-        JOIN departments d ON he.department_id = d.id
-        WHERE EXTRACT(YEAR FROM he.hire_datetime) = 2021
-        GROUP BY he.department_id, d.department
-    ),
-    average_hiring AS (
-        SELECT AVG(hired) AS avg_hires FROM department_hiring
-    )
-    SELECT
-        dh.id,
-        dh.department,
-        dh.hired
-    FROM department_hiring dh
-    JOIN average_hiring ah ON dh.hired > ah.avg_hires
-    ORDER BY dh.hired DESC;
-    """
-
     try:
+        cached = await _cache_get("metrics:departments")
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
         logger.info(
             "Executing query to fetch departments with above-average hiring")
-        results = await db.fetch(query)
-        logger.info(
-            f"Query executed successfully, retrieved {len(results)} records")
-        return [dict(row) for row in results]
+        return _stream_metrics(DEPT_AVG_SQL, "metrics:departments")
     except Exception as e:
         logger.error(f"Error executing query: {e}")
         return {"error": "Internal Server Error"}
 
 
-@app.get("/visuals/hired-employees-by-quarter")
-async def visualize_hired_employees(db: asyncpg.Connection = Depends(get_db)):
-    """Returns a bar chart image of employees hired per department and quarter."""
+def _render_quarter_chart(rows) -> bytes:
+    """Renders the hires-per-quarter bar chart as SVG bytes."""
+    # Aggregate hires per department across the four quarters
+    totals = {}
+    for row in rows:
+        totals.setdefault(row["department"], [0, 0, 0, 0])[
+            row["quarter"] - 1] += row["hires"]
 
-    try:
-        data = await get_hired_employees_by_quarter(db)
+    chart = pygal.Bar(title="Employees Hired Per Quarter (2021)",
+                      x_title="Quarter", y_title="Number of Hires")
+    chart.x_labels = ["Q1", "Q2", "Q3", "Q4"]
+    for department, hires in sorted(totals.items()):
+        chart.add(department, hires)
+    return chart.render()
 
-        # Check if the function returned an error
-        if isinstance(data, dict) and "error" in data:
-            return data
 
-        df = pd.DataFrame(data)
+def _render_departments_chart(rows, avg_hires) -> bytes:
+    """Renders the above-average departments chart as SVG bytes."""
+    chart = pygal.HorizontalBar(
+        title=f"Departments That Hired More Than the 2021 Average (avg: {avg_hires:.2f})",
+        x_title="Number of Hires")
+    for row in rows:
+        chart.add(row["department"], row["hired"])
+    return chart.render()
 
-        if df.empty:
-            return {"error": "No data available"}
 
-        # Transform Data for Plotting
-        df_melted = df.melt(
-            id_vars=["department", "job"], var_name="Quarter", value_name="Hires")
+@app.get("/visuals/hired-employees-by-quarter")
+async def visualize_hired_employees(request: Request, db: asyncpg.Connection = Depends(get_db)):
+    """Returns a bar chart of employees hired per department and quarter."""
 
-        # Create the Plot
-        plt.figure(figsize=(12, 6))
-        ax = sns.barplot(data=df_melted, x="Quarter",
-                         y="Hires", hue="department", estimator=sum)
-        ax.yaxis.get_major_locator().set_params(integer=True)
+    try:
+        svg = await _cache_get("visuals:quarter")
+        if svg is None:
+            stmt = await db.prepare(QUARTER_LONG_SQL)
+            rows = await stmt.fetch()
 
-        plt.title("Employees Hired Per Quarter (2021)")
-        plt.xlabel("Quarter")
-        plt.ylabel("Number of Hires")
-        plt.xticks(rotation=0)
-        plt.legend(title="Department", bbox_to_anchor=(
-            1.05, 1), loc='upper left')
+            if not rows:
+                return {"error": "No data available"}
 
-        # Save Plot to Memory
-        img_bytes = BytesIO()
-        plt.tight_layout()
-        plt.savefig(img_bytes, format="png")
-        plt.close()
-        img_bytes.seek(0)
+            svg = _render_quarter_chart(rows)
+            await _cache_set("visuals:quarter", svg)
 
-        return Response(content=img_bytes.getvalue(), media_type="image/png")
+        return _etag_response(svg, request, "image/svg+xml")
 
     except Exception as e:
         logger.error(f"Error generating visualization: {e}")
@@ -234,49 +369,24 @@ async def visualize_hired_employees(db: asyncpg.Connection = Depends(get_db)):
 
 
 @app.get("/visuals/departments-above-average-hiring")
-async def visualize_departments_above_average(db: asyncpg.Connection = Depends(get_db)):
-    """Returns a horizontal bar chart image of departments that hired above the 2021 average."""
+async def visualize_departments_above_average(request: Request, db: asyncpg.Connection = Depends(get_db)):
+    """Returns a horizontal bar chart of departments that hired above the 2021 average."""
 
     try:
-        data = await get_departments_above_average(db)
-
-        if isinstance(data, dict) and "error" in data:
-            return data
-
-        df = pd.DataFrame(data)
-
-        if df.empty:
-            return {"error": "No data available"}
-
-        # Fetch the correct average directly from the database
-        avg_query = "SELECT AVG(hired) FROM (SELECT COUNT(he.id) AS hired FROM hired_employees he WHERE EXTRACT(YEAR FROM he.hire_datetime) = 2021 GROUP BY he.department_id) AS department_hiring"
-        avg_hires = await db.fetchval(avg_query)
-
-        # Extract department names and hire counts
-        departments = df["department"]
-        hires = df["hired"]
-
-        # Create the figure
-        plt.figure(figsize=(10, 6))
-        ax = sns.barplot(y=departments, x=hires, palette="Blues_r")
-
-        # display average query
-        plt.axvline(avg_hires, color="red", linestyle="dashed",
-                    label=f"Avg Hires: {avg_hires:.2f}")
+        svg = await _cache_get("visuals:departments")
+        if svg is None:
+            stmt = await db.prepare(DEPT_AVG_SQL)
+            rows = await stmt.fetch()
 
-        plt.xlabel("Number of Hires")
-        plt.ylabel("Department")
-        plt.title("Departments That Hired More Than the 2021 Average")
-        plt.legend()
+            if not rows:
+                return {"error": "No data available"}
 
-        # Save figure to buffer
-        img_bytes = BytesIO()
-        plt.tight_layout()
-        plt.savefig(img_bytes, format="png", bbox_inches="tight")
-        plt.close()
-        img_bytes.seek(0)
+            # The query already computed the average in its CTE; every
+            # row carries it, so no extra round-trip is needed
+            svg = _render_departments_chart(rows, rows[0]["avg_hires"])
+            await _cache_set("visuals:departments", svg)
 
-        return Response(content=img_bytes.getvalue(), media_type="image/png")
+        return _etag_response(svg, request, "image/svg+xml")
 
     except Exception as e:
         logger.error(f"Error generating visualization: {e}")
@@ -1,7 +1,32 @@
+from datetime import datetime
+from typing import Dict, List, Literal, Type
 from pydantic import BaseModel, Field
-from typing import List
+
+
+class DepartmentInsert(BaseModel):
+    department: str
+
+
+class JobInsert(BaseModel):
+    job: str
+
+
+class HiredEmployeeInsert(BaseModel):
+    name: str
+    hire_datetime: datetime  # pydantic parses ISO-8601 (incl. trailing Z) natively
+    department_id: int
+    job_id: int
+
+
+# Per-table record models used to validate each entry of InsertRequest.data
+TABLE_MODELS: Dict[str, Type[BaseModel]] = {
+    "departments": DepartmentInsert,
+    "jobs": JobInsert,
+    "hired_employees": HiredEmployeeInsert,
+}
 
 
 class InsertRequest(BaseModel):
-    table: str = Field(..., example="hired_employees")
-    data: List[dict]  # Raw data, validated dynamically
+    table: Literal["departments", "jobs", "hired_employees"] = Field(
+        ..., example="hired_employees")
+    data: List[dict]  # Each record is validated against TABLE_MODELS[table]
@@ -7,3 +7,5 @@ class InsertResponse(BaseModel):
     message: str = Field(...,
                          example="10 records inserted into hired_employees")
     failed_records: List[dict] = Field(..., example=[])
+    # Failures beyond the reporting cap are only counted, not echoed back
+    failed_truncated: int = Field(0, example=0)
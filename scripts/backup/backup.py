@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from utils import fetch_table_data, save_as_avro, upload_to_s3
+from utils import dump_table_to_parquet, upload_fileobj_to_s3
 
 logger = logging.getLogger(__name__)
 
@@ -10,15 +10,15 @@ TABLES = ["departments", "jobs", "hired_employees"]
 async def backup_table(table_name):
     logger.info(f"Starting backup for table: {table_name}")
 
-    df = await fetch_table_data(table_name)
-    if df.empty:
+    parquet_buf = await dump_table_to_parquet(table_name)
+    if not parquet_buf:
         return
 
-    avro_file = save_as_avro(df, table_name)
-    if not avro_file:
-        return
-
-    upload_to_s3(avro_file, table_name)
+    # boto3 is blocking; run the upload in a worker thread so the other
+    # tables' backups keep progressing (no asyncio.to_thread on 3.8)
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(
+        None, upload_fileobj_to_s3, parquet_buf, table_name)
 
 
 async def main():
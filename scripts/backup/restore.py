@@ -1,10 +1,8 @@
 import asyncio
-import fastavro
 import pandas as pd
 import os
 import sys
 import logging
-from datetime import datetime
 from utils import get_db_connection, download_from_s3
 from dotenv import load_dotenv
 
@@ -18,7 +16,7 @@ VALID_TABLES = {"departments", "jobs", "hired_employees"}
 
 
 async def restore_table(table_name):
-    """Restores a specific table from its AVRO backup in S3."""
+    """Restores a specific table from its Parquet backup in S3."""
     logger.info(f"Starting restore for table: {table_name}")
 
     if table_name not in VALID_TABLES:
@@ -26,8 +24,8 @@ async def restore_table(table_name):
             f"Invalid table name: {table_name}. Allowed: {VALID_TABLES}")
         return
 
-    # Download the AVRO file from S3
-    local_file = f"{table_name}_backup.avro"
+    # Download the Parquet file from S3
+    local_file = f"{table_name}_backup.parquet"
     download_success = download_from_s3(table_name, local_file)
 
     if not download_success:
@@ -35,32 +33,22 @@ async def restore_table(table_name):
         return
 
     try:
-        with open(local_file, "rb") as f:
-            reader = fastavro.reader(f)
-            records = [record for record in reader]
+        # Parquet stores hire_datetime as a native timestamp, so no
+        # string-to-datetime conversion is needed after loading
+        df = pd.read_parquet(local_file)
 
-        if not records:
+        if df.empty:
             logger.warning(
-                f"No data in {table_name}_backup.avro, skipping restore.")
+                f"No data in {local_file}, skipping restore.")
             return
 
-        df = pd.DataFrame(records)
         logger.info(
-            f"Loaded {len(df)} records from {table_name}_backup.avro")
+            f"Loaded {len(df)} records from {local_file}")
 
     except Exception as e:
-        logger.error(f"Failed to read AVRO file {local_file}: {e}")
+        logger.error(f"Failed to read Parquet file {local_file}: {e}")
         return
 
-    # Convert `hire_datetime` to datetime object
-    if "hire_datetime" in df.columns:
-        # Ensure all datetimes are parsed correctly (removes 'Z' and applies UTC)
-        df["hire_datetime"] = df["hire_datetime"].str.replace(
-            "Z", "", regex=False)
-        df["hire_datetime"] = pd.to_datetime(
-            df["hire_datetime"], format="%Y-%m-%dT%H:%M:%S%z", utc=True)
-        logger.info(f"Converted hire_datetime to datetime object")
-
     conn = await get_db_connection()
     try:
         # Generate SQL query dynamically
@@ -79,8 +67,8 @@ async def restore_table(table_name):
         await conn.executemany(sql_query, df.itertuples(index=False, name=None))
         logger.info(
             f"Successfully restored {len(df)} records into {table_name}")
-        os.remove(f"{table_name}_backup.avro")
-        logger.info(f"Deleted local file: {table_name}_backup.avro")
+        os.remove(local_file)
+        logger.info(f"Deleted local file: {local_file}")
 
     except Exception as e:
         logger.error(f"Restore failed for {table_name}: {e}")
@@ -1,12 +1,20 @@
+import asyncio
 import asyncpg
 import boto3
-import fastavro
+import botocore.config
+from boto3.s3.transfer import TransferConfig
 import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import atexit
+import io
 import os
 import logging
+import queue
 import watchtower
 from datetime import datetime
 from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener
 
 env_path = os.path.abspath(os.path.join(
     os.path.dirname(__file__), "..", "..", ".env"))
@@ -22,23 +30,74 @@ AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 S3_BUCKET = "data-pipeline-backup-gb"
 
+# Multipart transfers with concurrent parts instead of one serial PUT/GET
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+)
+
+# One shared client: constructing one parses botocore's JSON service
+# models each time, and the larger connection pool serves the concurrent
+# multipart parts and parallel table uploads
+_s3 = boto3.client(
+    "s3", aws_access_key_id=AWS_ACCESS_KEY,
+    aws_secret_access_key=AWS_SECRET_KEY, region_name=AWS_REGION,
+    config=botocore.config.Config(max_pool_connections=50))
+
 LOG_GROUP = "data-backup-logs"
 LOG_STREAM = f"backup-script-{datetime.today().strftime('%Y-%m-%d')}"
 
 cloudwatch_handler = watchtower.CloudWatchLogHandler(
-    log_group=LOG_GROUP)
+    log_group=LOG_GROUP, log_stream_name=LOG_STREAM)
+
+# Logging calls only enqueue the record; a background listener thread
+# ships them to the console and CloudWatch off the backup coroutines
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.StreamHandler(),        # Log to console
+    cloudwatch_handler              # Send logs to CloudWatch
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),        # Log to console
-        cloudwatch_handler              # Send logs to CloudWatch
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 
+_pool = None
+_pool_lock = None
+
+
+async def get_pool():
+    """Returns the shared asyncpg pool, creating it on first use."""
+    global _pool, _pool_lock
+    if _pool_lock is None:
+        # Created lazily so the lock binds to the running event loop;
+        # this check has no await, so it cannot itself race
+        _pool_lock = asyncio.Lock()
+    # The table backups run under asyncio.gather, so without the lock
+    # each coroutine would see _pool is None and create its own pool
+    async with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = await asyncpg.create_pool(
+                    host=DB_HOST, database=DB_NAME, user=DB_USER,
+                    password=DB_PASSWORD, min_size=2, max_size=10)
+                logger.info(
+                    "Successfully created the PostgreSQL connection pool")
+            except Exception as e:
+                logger.error(f"Database connection failed: {e}")
+                raise
+    return _pool
+
+
 async def get_db_connection():
     try:
         conn = await asyncpg.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
@@ -51,124 +110,101 @@ async def get_db_connection():
 
 async def fetch_table_data(table_name):
     """Fetches all data from a given PostgreSQL table and ensures correct column names."""
-    conn = None
     try:
-        conn = await get_db_connection()
-
-        # Fetch column names first
-        col_query = f"""
-        SELECT column_name FROM information_schema.columns 
-        WHERE table_name = '{table_name}' ORDER BY ordinal_position
-        """
-        col_rows = await conn.fetch(col_query)
-        columns = [row["column_name"]
-                   for row in col_rows]
-
-        if not columns:
-            logger.error(
-                f"No columns found for {table_name}. Check table name.")
-            return pd.DataFrame()
-
-        # Fetch actual data
-        query = f"SELECT * FROM {table_name}"
-        rows = await conn.fetch(query)
-
-        if not rows:
-            logger.warning(
-                f"No data found in {table_name}. Skipping backup.")
-            return pd.DataFrame()
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # Fetch column names first; the parameterized text is cached
+            # once by asyncpg and reused across tables (and can't be
+            # injected through)
+            col_query = """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = $1 ORDER BY ordinal_position
+            """
+            col_rows = await conn.fetch(col_query, table_name)
+            columns = [row["column_name"]
+                       for row in col_rows]
+
+            if not columns:
+                logger.error(
+                    f"No columns found for {table_name}. Check table name.")
+                return pd.DataFrame()
+
+            # Fetch actual data
+            query = f"SELECT * FROM {table_name}"
+            rows = await conn.fetch(query)
+
+            if not rows:
+                logger.warning(
+                    f"No data found in {table_name}. Skipping backup.")
+                return pd.DataFrame()
+
+            # Convert data to DataFrame with correct column names
+            df = pd.DataFrame(rows, columns=columns)
 
-        # Convert data to DataFrame with correct column names
-        df = pd.DataFrame(rows, columns=columns)
-
-        logger.info(
-            f"Successfully fetched {len(df)} rows from {table_name}.")
+            logger.info(
+                f"Successfully fetched {len(df)} rows from {table_name}.")
 
-        return df
+            return df
     except Exception as e:
         logger.error(f"Failed to fetch data from {table_name}: {e}")
         return pd.DataFrame()
-    finally:
-        if conn:
-            await conn.close()
-            logger.info(
-                f"Database connection closed for table {table_name}.")
-
-
-def save_as_avro(df, table_name):
-    """Converts a Pandas DataFrame into an AVRO file with correct data types."""
-    if df.empty:
-        logger.warning(
-            f"No data found in table {table_name}, skipping backup.")
-        return None
 
-    avro_filename = f"{table_name}_backup.avro"
-
-    dtype_mapping = {
-        "int64": "int",
-        "float64": "float",
-        "bool": "boolean",
-        # Ensure datetime columns are stored as string
-        "datetime64[ns]": "string",
-        "object": "string"
-    }
-
-    # Convert datetime columns to proper ISO format
-    if "hire_datetime" in df.columns:
-        df["hire_datetime"] = df["hire_datetime"].astype(
-            str)  # Force conversion to string
-        df["hire_datetime"] = df["hire_datetime"].apply(
-            lambda x: x.replace(" ", "T") + "Z")  # Ensure correct ISO 8601 format
-
-    schema = {
-        "type": "record",
-        "name": table_name,
-        "fields": [
-            {"name": col, "type": dtype_mapping.get(
-                str(df[col].dtype), "string")}
-            for col in df.columns
-        ]
-    }
-
-    records = df.to_dict(orient="records")
 
+async def dump_table_to_parquet(table_name):
+    """Streams a table out of PostgreSQL into an in-memory Parquet buffer,
+    without building an intermediate DataFrame or touching local disk."""
     try:
-        with open(avro_filename, "wb") as out_file:
-            fastavro.writer(out_file, schema, records)
-        logger.info(f"AVRO file created: {avro_filename}")
-        return avro_filename
+        pool = await get_pool()
+        buf = io.BytesIO()
+        async with pool.acquire() as conn:
+            # COPY streams the rows out of Postgres in one pass; pyarrow
+            # then parses them into column buffers with no per-row
+            # Python objects or asyncpg Records in between
+            await conn.copy_from_query(
+                f"SELECT * FROM {table_name}", output=buf,
+                format="csv", header=True)
+
+        buf.seek(0)
+        table = pacsv.read_csv(buf)
+
+        if table.num_rows == 0:
+            logger.warning(
+                f"No data found in {table_name}. Skipping backup.")
+            return None
+
+        out_buf = io.BytesIO()
+        pq.write_table(table, out_buf, compression="snappy")
+        out_buf.seek(0)
+        logger.info(
+            f"Parquet buffer created for {table_name} ({table.num_rows} rows)")
+        return out_buf
     except Exception as e:
-        logger.error(f"Failed to create AVRO file for {table_name}: {e}")
+        logger.error(f"Failed to dump {table_name} to Parquet: {e}")
         return None
 
 
-def upload_to_s3(file_path, table_name):
-    if file_path is None:
+def upload_fileobj_to_s3(buf, table_name):
+    if buf is None:
         return
 
     try:
-        s3_client = boto3.client(
-            "s3", aws_access_key_id=AWS_ACCESS_KEY, aws_secret_access_key=AWS_SECRET_KEY)
-        s3_filename = f"{table_name}_backup.avro"
+        s3_filename = f"{table_name}_backup.parquet"
 
-        s3_client.upload_file(file_path, S3_BUCKET, s3_filename)
+        _s3.upload_fileobj(buf, S3_BUCKET, s3_filename,
+                           Config=TRANSFER_CONFIG)
         logger.info(
-            f"Uploaded {file_path} to s3://{S3_BUCKET}/{s3_filename}")
-
-        os.remove(file_path)
-        logger.info(f"Deleted local file: {file_path}")
+            f"Uploaded {table_name} backup to s3://{S3_BUCKET}/{s3_filename}")
 
     except Exception as e:
-        logger.error(f"Failed to upload {file_path} to S3: {e}")
+        logger.error(f"Failed to upload {table_name} backup to S3: {e}")
 
 
 def download_from_s3(table_name, local_path):
     try:
-        s3_client = boto3.client(
-            "s3", aws_access_key_id=AWS_ACCESS_KEY, aws_secret_access_key=AWS_SECRET_KEY)
-        s3_filename = f"{table_name}_backup.avro"
+        s3_filename = f"{table_name}_backup.parquet"
 
-        s3_client.download_file(S3_BUCKET, s3_filename, local_path)
+        _s3.download_file(S3_BUCKET, s3_filename, local_path,
+                          Config=TRANSFER_CONFIG)
         logger.info(f"Downloaded {s3_filename} from S3 to {local_path}")
         return local_path
     except Exception as e:
@@ -1,10 +1,17 @@
+import atexit
 import boto3
+import botocore.config
+import csv
 import pandas as pd
 import psycopg2
 import io
 import os
 import logging
+import queue
+import threading
 import watchtower
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 import os
 
@@ -21,17 +28,26 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_PORT = os.getenv("DB_PORT")
 
-s3_client = boto3.client("s3")
+s3_client = boto3.client(
+    "s3", config=botocore.config.Config(max_pool_connections=50))
 cloudwatch_handler = watchtower.CloudWatchLogHandler(
     log_group=CLOUDWATCH_LOG_GROUP)
 
+# Logging calls only enqueue the record; a background listener thread
+# ships them to the console and CloudWatch off the migration threads
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.StreamHandler(),        # Log to console
+    cloudwatch_handler              # Send logs to CloudWatch
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),        # Log to console
-        cloudwatch_handler              # Send logs to CloudWatch
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 
 FILES = {
@@ -40,53 +56,96 @@ FILES = {
     "hired_employees": "hired_employees.csv"
 }
 
+# Integer columns are read as nullable Int64: with plain int64, a chunk
+# containing NaNs upcasts the column to float and COPY would feed "3.0"
+# into an INTEGER column even after the bad rows are dropped
+INT_COLUMNS = {
+    "departments": {"id": "Int64"},
+    "jobs": {"id": "Int64"},
+    "hired_employees": {"id": "Int64", "department_id": "Int64",
+                        "job_id": "Int64"}
+}
+
+
+# Rows processed per chunk: bounds peak memory and lets each COPY run
+# while the next chunk is still downloading/parsing
+CHUNK_SIZE = 100_000
+
 
-def read_csv_from_s3(file_key, column_names):
-    """Read CSV file from S3 into a Pandas DataFrame with predefined column names"""
-    logging.info(f"Downloading {file_key} from S3...")
+def migrate_table(cursor, table_name, file_key, column_names):
+    """Streams a CSV from S3 in chunks, validating and loading each chunk"""
+    logging.info(f"Migrating {table_name} from {file_key}...")
     obj = s3_client.get_object(Bucket=S3_BUCKET, Key=file_key)
-    df = pd.read_csv(io.BytesIO(obj["Body"].read()),
-                     encoding="utf-8", names=column_names)
-    logging.info(
-        f"Successfully loaded {file_key} into DataFrame with {len(df)} records.")
-    return df
+    total = 0
+    # StreamingBody is file-like, so pandas parses while it downloads
+    # instead of buffering the whole object in memory first
+    for chunk in pd.read_csv(obj["Body"], encoding="utf-8",
+                             names=column_names, chunksize=CHUNK_SIZE,
+                             dtype=INT_COLUMNS[table_name]):
+        chunk = validate_data(chunk, table_name)
+        insert_data(cursor, table_name, chunk)
+        total += len(chunk)
+    logging.info(f"Finished migrating {total} records into {table_name}.")
+
+
+# failed_records.log is appended through one shared handle and writer
+# instead of re-opening the file and rebuilding pandas' CSV formatter on
+# every validate_data call
+_failed_log_fh = None
+_failed_log_writer = None
+_failed_log_lock = threading.Lock()  # tables validate from worker threads
+
+
+def _get_failed_log_writer():
+    global _failed_log_fh, _failed_log_writer
+    if _failed_log_writer is None:
+        _failed_log_fh = open("failed_records.log", "a", newline="")
+        _failed_log_writer = csv.writer(_failed_log_fh)
+        atexit.register(_failed_log_fh.close)
+    return _failed_log_writer
 
 
 def validate_data(data, table_name):
     """Validate data: check for missing values and log rejected rows"""
-    logging.info(f"Validating data for {table_name}...")
-    if data.isnull().values.any():
-        failed_rows = data[data.isnull().any(axis=1)]
-        failed_rows.to_csv("failed_records.log", mode="a",
-                           header=False, index=False)
+    logging.debug(f"Validating data for {table_name}...")
+    # One pass over the null mask instead of three (any + select + dropna)
+    mask = data.isna().any(axis=1)
+    if mask.any():
+        failed_rows = data[mask]
+        with _failed_log_lock:
+            _get_failed_log_writer().writerows(
+                failed_rows.itertuples(index=False, name=None))
         logging.warning(
             f"{len(failed_rows)} invalid rows found in {table_name}. Logged to failed_records.log.")
-        data = data.dropna()
-    logging.info(
+        data = data[~mask]
+    logging.debug(
         f"Validation complete for {table_name}. {len(data)} valid records remain.")
     return data
 
 
 def insert_data(cursor, table_name, data):
-    """Insert data into PostgreSQL in batches"""
+    """Bulk load data into PostgreSQL via COPY FROM STDIN"""
     if data.empty:
         logging.warning(
             f"No valid data to insert for {table_name}. Skipping...")
         return
 
     columns = ", ".join(data.columns)
-    placeholders = ", ".join(["%s"] * len(data.columns))
-    insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
 
-    batch_size = 500
-    for i in range(0, len(data), batch_size):
-        batch = [tuple(row) for row in data.iloc[i:i+batch_size].to_numpy()]
-        cursor.executemany(insert_query, batch)
-        logging.info(f"Inserted {len(batch)} records into {table_name}.")
+    # COPY streams the whole frame in one shot through PostgreSQL's bulk
+    # protocol instead of parsing an INSERT per 500-row batch
+    buf = io.StringIO()
+    data.to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT CSV, NULL '\\N')", buf)
+    logging.debug(f"Inserted {len(data)} records into {table_name}.")
 
 
 def upload_log_to_s3(log_file, s3_key):
     """Uploads a log file to S3 and deletes it after upload"""
+    if _failed_log_fh is not None:
+        _failed_log_fh.flush()  # make buffered failures visible on disk
     if os.path.exists(log_file) and os.path.getsize(log_file) > 0:
         try:
             s3_client.upload_file(log_file, S3_BUCKET, s3_key)
@@ -96,49 +155,56 @@ def upload_log_to_s3(log_file, s3_key):
             logging.error(f"Failed to upload {log_file} to S3: {e}")
 
 
-def migrate():
-    """Migrate data from S3 to PostgreSQL securely and upload logs"""
-    conn = None
+def migrate_one(table_name, file_key, column_names):
+    """Migrates one table on its own connection so tables can run in parallel"""
+    conn = psycopg2.connect(
+        host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD, port=DB_PORT
+    )
     try:
-        logging.info("Starting data migration...")
-        conn = psycopg2.connect(
-            host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD, port=DB_PORT
-        )
         cursor = conn.cursor()
         logging.info(
-            f"Connected to PostgreSQL at {DB_HOST}:{DB_PORT}, Database: {DB_NAME}")
-
-        # Load, validate, and insert departments
-        logging.info("Migrating departments...")
-        departments_df = read_csv_from_s3(
-            FILES["departments"], ["id", "department"])
-        departments_df = validate_data(departments_df, "departments")
-        insert_data(cursor, "departments", departments_df)
-
-        # Load, validate, and insert jobs
-        logging.info("Migrating jobs...")
-        jobs_df = read_csv_from_s3(FILES["jobs"], ["id", "job"])
-        jobs_df = validate_data(jobs_df, "jobs")
-        insert_data(cursor, "jobs", jobs_df)
-
-        # Load, validate, and insert hired employees
-        logging.info("Migrating hired employees...")
-        hired_df = read_csv_from_s3(FILES["hired_employees"], [
-                                    "id", "name", "hire_datetime", "department_id", "job_id"])
-        hired_df = validate_data(hired_df, "hired_employees")
-        insert_data(cursor, "hired_employees", hired_df)
+            f"Connected to PostgreSQL at {DB_HOST}:{DB_PORT} for {table_name}")
 
+        # Skip the WAL fsync wait on commit: if the load fails it is
+        # simply re-run from the CSVs, so durability of the in-flight
+        # transaction buys nothing here
+        cursor.execute("SET LOCAL synchronous_commit = OFF")
+
+        migrate_table(cursor, table_name, file_key, column_names)
         conn.commit()
+
+    finally:
+        conn.close()
+        logging.info(f"Connection closed for {table_name}.")
+
+
+def migrate():
+    """Migrate data from S3 to PostgreSQL securely and upload logs"""
+    try:
+        logging.info("Starting data migration...")
+
+        # departments and jobs are independent, so their downloads and
+        # COPY streams run in parallel; hired_employees loads afterwards
+        # because its foreign keys need both parents committed
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(migrate_one, "departments",
+                                FILES["departments"], ["id", "department"]),
+                executor.submit(migrate_one, "jobs",
+                                FILES["jobs"], ["id", "job"]),
+            ]
+            for future in futures:
+                future.result()
+
+        migrate_one("hired_employees", FILES["hired_employees"],
+                    ["id", "name", "hire_datetime", "department_id", "job_id"])
+
         logging.info("Migration completed successfully!")
 
     except Exception as e:
         logging.error(f"Migration failed: {e}")
 
     finally:
-        if conn is not None:
-            conn.close()
-            logging.info("Connection closed.")
-
         upload_log_to_s3("failed_records.log", "logs/failed_records.log")
 
 
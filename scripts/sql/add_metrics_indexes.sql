@@ -0,0 +1,6 @@
+-- Indexes backing the sargable range filter on hire_datetime used by the
+-- metrics queries. schema_tables.sql already creates these for new
+-- databases; this migration covers databases created before it did.
+CREATE INDEX IF NOT EXISTS idx_hired_employees_datetime ON hired_employees(hire_datetime);
+CREATE INDEX IF NOT EXISTS idx_hired_employees_department ON hired_employees(department_id);
+CREATE INDEX IF NOT EXISTS idx_hired_employees_job ON hired_employees(job_id);
@@ -0,0 +1,10 @@
+-- Targeted indexes for the 2021 metrics queries. The partial index keeps
+-- only the rows the metrics actually scan; the BRIN index stays tiny for
+-- the append-only hired_employees table. CONCURRENTLY avoids blocking
+-- writes, so run these statements outside a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS hired_employees_2021_dept_idx
+    ON hired_employees(department_id)
+    WHERE hire_datetime >= '2021-01-01' AND hire_datetime < '2022-01-01';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS hired_employees_dt_brin
+    ON hired_employees USING BRIN (hire_datetime);